@@ -20,22 +20,66 @@ math rendering quality.
 
 Dependencies:
 - lxml: For robust SVG parsing and manipulation.
-- numpy: For accurate handling of SVG transformation matrices.
 
-Install them with:
-pip3 install lxml numpy
+Install it with:
+pip3 install lxml
 """
 
 import sys
 import os
 import re
+import math
+import functools
 import lxml.etree as etree
-import numpy as np
 
-PX_TO_PT = 72.0 / 96.0  
+PX_TO_PT = 72.0 / 96.0
 SVG_NS = "http://www.w3.org/2000/svg"
 NAMESPACES = {'svg': SVG_NS}
 
+# Patterns are compiled once at import time; the per-text-node loop would
+# otherwise pay the `re` cache lookup on every call.
+_DIM_STRIP_RE = re.compile(r'[^\d.]')
+_TRANSFORM_RE = re.compile(r'\s*(matrix|translate|scale)\s*\(([^)]+)\)')
+_ARGS_SPLIT_RE = re.compile(r'[,\s]+')
+# One pattern pulls both style fields in a single scan of the string,
+# instead of dispatching the regex engine twice per text node.
+_STYLE_RE = re.compile(
+    r'font-size:(?P<fs>[\d.]+)px|text-anchor:(?P<ta>start|middle|end)')
+
+_TEXT_TAG = f'{{{SVG_NS}}}text'
+
+# Per-label output machinery, built once: the escape table does both
+# replacements in a single pass over the content, and the place() line is
+# a shared template filled per label.
+_ESCAPE = str.maketrans({'\\': '\\\\', '"': '\\"'})
+_ALIGN_MAP = {'start': 'left', 'middle': 'center', 'end': 'right'}
+_PLACE_TMPL = (
+    '    place(dx: s * {:.4f}pt, dy: s * {:.4f}pt, '
+    'align(horizon + {})[  #block(text(size: s * {:.4f}pt)[{}])]),\n'
+)
+
+# 2D affine transforms are stored as 6-tuples (a, b, c, d, e, f), the
+# effective matrix being [[a, c, e], [b, d, f], [0, 0, 1]]. The last row
+# is invariant for SVG transforms, so carrying full 3x3 arrays around
+# only adds allocation and matmul overhead.
+IDENTITY = (1.0, 0.0, 0.0, 1.0, 0.0, 0.0)
+
+
+def compose_transforms(m1, m2):
+    """
+    Composes two affine 6-tuples, equivalent to the matrix product m1 @ m2.
+    """
+    a1, b1, c1, d1, e1, f1 = m1
+    a2, b2, c2, d2, e2, f2 = m2
+    return (
+        a1 * a2 + c1 * b2,
+        b1 * a2 + d1 * b2,
+        a1 * c2 + c1 * d2,
+        b1 * c2 + d1 * d2,
+        a1 * e2 + c1 * f2 + e1,
+        b1 * e2 + d1 * f2 + f1,
+    )
+
 
 def parse_svg_dimensions(root):
     """
@@ -46,8 +90,8 @@ def parse_svg_dimensions(root):
     height_str = root.get('height')
 
     if width_str and height_str:
-        w = float(re.sub(r'[^\d.]', '', width_str))
-        h = float(re.sub(r'[^\d.]', '', height_str))
+        w = float(_DIM_STRIP_RE.sub('', width_str))
+        h = float(_DIM_STRIP_RE.sub('', height_str))
         # Assume px if no units are specified, which is standard
         return w * PX_TO_PT, h * PX_TO_PT
     
@@ -58,62 +102,49 @@ def parse_svg_dimensions(root):
     
     raise ValueError("SVG has no width/height or viewBox attribute.")
 
+@functools.lru_cache(maxsize=4096)
 def parse_transform(transform_str):
     """
-    Parses an SVG transform string into a 3x3 NumPy matrix.
+    Parses an SVG transform string into an affine 6-tuple.
     Supports matrix, translate, and scale.
+
+    Results are cached: Inkscape exports commonly stamp the same
+    transform string across many siblings, and the cumulative-transform
+    walk revisits each ancestor's attribute once per text node.
     """
     if not transform_str:
-        return np.identity(3)
+        return IDENTITY
 
-    total_transform = np.identity(3)
-    
-    # Regex to find all transform functions
-    pattern = r'\s*(matrix|translate|scale)\s*\(([^)]+)\)'
-    matches = re.findall(pattern, transform_str)
+    # Fast path: Inkscape overwhelmingly emits a lone matrix(...) with six
+    # numbers, which needs no regex machinery at all
+    if transform_str.startswith('matrix(') and transform_str.endswith(')'):
+        args = transform_str[7:-1].replace(',', ' ').split()
+        if len(args) == 6:
+            return tuple(float(arg) for arg in args)
+
+    total_transform = IDENTITY
+
+    # Find all transform functions
+    matches = _TRANSFORM_RE.findall(transform_str)
 
     for func, args_str in matches:
-        args = [float(arg) for arg in re.split(r'[,\s]+', args_str.strip())]
-        m = np.identity(3)
+        args = [float(arg) for arg in _ARGS_SPLIT_RE.split(args_str.strip())]
         if func == 'matrix' and len(args) == 6:
-            a, b, c, d, e, f = args
-            m[0, 0] = a; m[0, 1] = c; m[0, 2] = e
-            m[1, 0] = b; m[1, 1] = d; m[1, 2] = f
+            m = tuple(args)
         elif func == 'translate':
             tx = args[0]
-            ty = args[1] if len(args) > 1 else 0
-            m[0, 2] = tx
-            m[1, 2] = ty
+            ty = args[1] if len(args) > 1 else 0.0
+            m = (1.0, 0.0, 0.0, 1.0, tx, ty)
         elif func == 'scale':
             sx = args[0]
             sy = args[1] if len(args) > 1 else sx
-            m[0, 0] = sx
-            m[1, 1] = sy
-        
-        total_transform = m @ total_transform
-        
-    return total_transform
+            m = (sx, 0.0, 0.0, sy, 0.0, 0.0)
+        else:
+            m = IDENTITY
 
-def get_cumulative_transform(element):
-    """
-    Accumulates transformations from an element up to the SVG root.
-    """
-    transform = np.identity(3)
-    # The `iterancestors` method comes from lxml's element objects
-    for ancestor in element.iterancestors():
-        # Stop at the root <svg> element
-        if ancestor.tag == etree.QName(SVG_NS, 'svg'):
-            break
-        transform_str = ancestor.get('transform', '')
-        ancestor_transform = parse_transform(transform_str)
-        transform = ancestor_transform @ transform
-        
-    # Also include the element's own transform
-    element_transform_str = element.get('transform', '')
-    element_transform = parse_transform(element_transform_str)
-    transform = transform @ element_transform
+        total_transform = compose_transforms(m, total_transform)
 
-    return transform
+    return total_transform
 
 def process_svg(input_path):
     """
@@ -121,7 +152,16 @@ def process_svg(input_path):
     """
     # Parse SVG and Prepare
     try:
-        parser = etree.XMLParser(remove_blank_text=True)
+        # collect_ids=False skips building the ID table (never queried
+        # here), resolve_entities=False avoids DTD lookups, and
+        # huge_tree=True lifts libxml2's depth/size limits for the
+        # multi-MB files Inkscape can produce.
+        parser = etree.XMLParser(
+            remove_blank_text=True,
+            collect_ids=False,
+            resolve_entities=False,
+            huge_tree=True,
+        )
         tree = etree.parse(input_path, parser)
         root = tree.getroot()
     except Exception as e:
@@ -140,111 +180,134 @@ def process_svg(input_path):
     # Find and Process Text Elements
     labels = []
     text_nodes_to_remove = []
-    
-    # Find all <text> elements 
-    for text_node in root.xpath('//svg:text', namespaces=NAMESPACES):
-        # Extract Raw Attributes 
+
+    # Single document-order traversal: a stack of cumulative transforms is
+    # maintained as elements open and close, so each transform attribute is
+    # parsed once and no per-text upward ancestor walk is needed.
+    transform_stack = [IDENTITY]
+    for event, text_node in etree.iterwalk(root, events=('start', 'end')):
+        if event == 'end':
+            transform_stack.pop()
+            continue
+
+        if text_node is root:
+            # The root <svg> transform does not apply to content coordinates
+            transform_str = None
+        else:
+            transform_str = text_node.get('transform')
+        if transform_str:
+            transform_stack.append(compose_transforms(
+                transform_stack[-1], parse_transform(transform_str)))
+        else:
+            # Untransformed elements -- the common case -- share the
+            # parent's cumulative tuple with no parse or compose at all
+            transform_stack.append(transform_stack[-1])
+
+        if text_node.tag != _TEXT_TAG:
+            continue
+
+        # Extract Raw Attributes
         x = float(text_node.get('x', '0'))
         y = float(text_node.get('y', '0'))
-        
-        # Font size from style attribute 
-        style = text_node.get('style', '')
-        font_size_match = re.search(r'font-size:([\d.]+)px', style)
-        font_size_px = float(font_size_match.group(1)) if font_size_match else 16.0 # Default
 
-        # Text anchor from style or attribute
-        anchor_match = re.search(r'text-anchor:(start|middle|end)', style)
-        text_anchor = anchor_match.group(1) if anchor_match else text_node.get('text-anchor', 'start')
+        # Font size and text anchor from the style attribute
+        style = text_node.get('style', '')
+        font_size_px = None
+        text_anchor = None
+        for style_match in _STYLE_RE.finditer(style):
+            if style_match['fs'] is not None:
+                if font_size_px is None:
+                    font_size_px = float(style_match['fs'])
+            elif text_anchor is None:
+                text_anchor = style_match['ta']
+            if font_size_px is not None and text_anchor is not None:
+                break
+        if font_size_px is None:
+            font_size_px = 16.0  # Default
+        if text_anchor is None:
+            text_anchor = text_node.get('text-anchor', 'start')
         
-        # Get Text Content (handles <tspan>) 
-        raw_text = "".join(text_node.itertext()).strip()
+        # Get Text Content (handles <tspan>); method='text' collects the
+        # descendant text inside libxml2 instead of a Python generator
+        raw_text = etree.tostring(
+            text_node, method='text', encoding='unicode', with_tail=False).strip()
         if not raw_text:
             continue
 
-        # Accumulate Transforms
-        transform_matrix = get_cumulative_transform(text_node)
-        
-        # Apply matrix to the text's (x,y) coordinates
-        transformed_point = transform_matrix @ np.array([x, y, 1])
-        final_x_px, final_y_px = transformed_point[0], transformed_point[1]
+        # Apply the cumulative transform (top of the traversal stack) to
+        # the coordinates and font size, then convert px to pt
+        a, b, c, d, e, f = transform_stack[-1]
+        final_x_pt = (a * x + c * y + e) * PX_TO_PT
+        final_y_pt = (b * x + d * y + f) * PX_TO_PT
+        final_font_size_pt = font_size_px * math.sqrt(b * b + d * d) * PX_TO_PT
+        final_y_pt -= 0.8 * final_font_size_pt  # ascent estimate
 
-        # Apply Transforms to Font Size
-        sy = np.sqrt(transform_matrix[1, 0]**2 + transform_matrix[1, 1]**2)
-        final_font_size_px = font_size_px * sy
-        
-        # Unit Conversion and Baseline Adjustment 
-        final_x_pt = final_x_px * PX_TO_PT
-        final_y_pt = final_y_px * PX_TO_PT
-        final_font_size_pt = final_font_size_px * PX_TO_PT
-        ascent_estimate = 0.8 * final_font_size_pt
-        final_y_pt -= ascent_estimate
-
-        content = raw_text
-        
-        # Store Processed Label Info 
+        # Store Processed Label Info
         labels.append({
             'x_pt': final_x_pt,
             'y_pt': final_y_pt,
             'font_size_pt': final_font_size_pt,
-            'content': content,
+            'content': raw_text,
             'anchor': text_anchor
         })
-        
+
         # Mark node for removal
         text_nodes_to_remove.append(text_node)
 
-    # Clean the SVG 
+    # Clean the SVG: group the doomed nodes by parent and drop them in
+    # reverse document order, so each remove scans the parent's child list
+    # once near its end instead of from the front per node
+    nodes_by_parent = {}
     for node in text_nodes_to_remove:
-        node.getparent().remove(node)
-        
+        parent = node.getparent()
+        nodes_by_parent.setdefault(id(parent), (parent, []))[1].append(node)
+    for parent, nodes in nodes_by_parent.values():
+        for node in reversed(nodes):
+            parent.remove(node)
+
+
+    # Derive every output path once
     base, _ = os.path.splitext(input_path)
+    input_basename = os.path.basename(input_path)
     clean_svg_path = f"{base}_dobb_clean.svg"
-    # The lxml tree object handles writing perfectly.
-    tree.write(clean_svg_path, pretty_print=True, xml_declaration=True, encoding='UTF-8')
+    clean_svg_filename = os.path.basename(clean_svg_path)
+    typst_path = f"{base}.typ"
+    # The lxml tree object handles writing perfectly. No pretty-printing:
+    # the file is only ever read back by Typst, and re-indenting the
+    # whole tree costs extra serializer CPU and disk bytes.
+    tree.write(clean_svg_path, xml_declaration=True, encoding='UTF-8')
     print(f"Successfully created clean SVG: '{clean_svg_path}'")
 
-    # Generate the Typst File 
-    typst_path = f"{base}.typ"
-    clean_svg_filename = os.path.basename(clean_svg_path)
-    
-    # Header and scaling logic
-    typst_code = [
-        f'// Auto-generated by typst_inkscape.py from {os.path.basename(input_path)}',
-        f'#let diagram(width: auto) = {{',
-        f'  // Original dimensions: {width_pt:.2f}pt x {height_pt:.2f}pt',
-        f'  let W = {width_pt:.4f}pt',
-        f'  let H = {height_pt:.4f}pt',
-        f'  let s = if width == auto {{ 1.0 }} else {{ width / W }}',
-        f'',
-        f'  stack(',
-    ]
-
-    # Add each label
-    for label in labels:
-        content_escaped = label['content'].replace('\\', '\\\\').replace('"', '\\"')
-        typst_text = f'{content_escaped}'
-        
-        align_map = {'start': 'left', 'middle': 'center', 'end': 'right'}
-        typst_align = align_map.get(label['anchor'], 'left')
-
-        move_call = (
-            f'    place('
-            f'dx: s * {label["x_pt"]:.4f}pt, dy: s * {label["y_pt"]:.4f}pt, '
-            f'align(horizon + {typst_align})['
-            f'  #block(text(size: s * {label["font_size_pt"]:.4f}pt)[{typst_text}])'
-            f']),'
+    # Generate the Typst File
+    # Stream the code straight to the file rather than accumulating a
+    # list of lines plus one big joined string.
+    with open(typst_path, 'w', encoding='utf-8') as f:
+        # Header and scaling logic
+        f.write(
+            f'// Auto-generated by typst_inkscape.py from {input_basename}\n'
+            f'#let diagram(width: auto) = {{\n'
+            f'  // Original dimensions: {width_pt:.2f}pt x {height_pt:.2f}pt\n'
+            f'  let W = {width_pt:.4f}pt\n'
+            f'  let H = {height_pt:.4f}pt\n'
+            f'  let s = if width == auto {{ 1.0 }} else {{ width / W }}\n'
+            f'\n'
+            f'  stack(\n'
         )
-        typst_code.append(move_call)
 
-    typst_code.append(
-        f'    image("{clean_svg_filename}", width: s * W),',
-        )
-    typst_code.append('  )')
-    typst_code.append('}')
+        # Add each label
+        for label in labels:
+            f.write(_PLACE_TMPL.format(
+                label['x_pt'],
+                label['y_pt'],
+                _ALIGN_MAP.get(label['anchor'], 'left'),
+                label['font_size_pt'],
+                label['content'].translate(_ESCAPE),
+            ))
+
+        f.write(f'    image("{clean_svg_filename}", width: s * W),\n')
+        f.write('  )\n}')
+
 
-    with open(typst_path, 'w', encoding='utf-8') as f:
-        f.write('\n'.join(typst_code))
-    
     print(f"Successfully created Typst file: '{typst_path}'")
 
 